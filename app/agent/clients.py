@@ -46,8 +46,12 @@ class BaseClient(ABC):
         api_key (str): The API key for authentication.
         max_input_len (int): Maximum allowed input length in tokens.
         max_output_len (int): Maximum allowed output length in tokens.
+        usage_stats (Dict[str, int]): Cumulative token usage, including prompt-cache hits.
+        supports_structured_output (bool): Whether `chat_structured` is implemented.
     """
 
+    supports_structured_output: bool = False
+
     def __init__(self, api_key: str, max_input_len: int = MAX_INPUT_LEN, max_output_len: int = MAX_OUTPUT_LEN):
         """
         Initialize the BaseClient.
@@ -60,6 +64,27 @@ class BaseClient(ABC):
         self.api_key: str = api_key
         self.max_input_len: int = max_input_len
         self.max_output_len: int = max_output_len
+        self.usage_stats: Dict[str, int] = {
+            'requests': 0,
+            'prompt_tokens': 0,
+            'cached_tokens': 0,
+            'completion_tokens': 0,
+        }
+
+    def _record_usage(self, prompt_tokens: int, cached_tokens: int, completion_tokens: int) -> None:
+        """
+        Accumulate token usage, including prompt tokens served from the provider's prompt cache.
+
+        Args:
+            prompt_tokens (int): All input tokens of the request, including the cached ones.
+            cached_tokens (int): The subset of prompt_tokens that hit the prompt cache.
+            completion_tokens (int): Output tokens generated.
+        """
+        self.usage_stats['requests'] += 1
+        self.usage_stats['prompt_tokens'] += prompt_tokens
+        self.usage_stats['cached_tokens'] += cached_tokens
+        self.usage_stats['completion_tokens'] += completion_tokens
+        logger.info(f"Token usage: prompt={prompt_tokens} cached={cached_tokens} completion={completion_tokens}")
 
     @abstractmethod
     def _make_api_call(self, *args: Any, **kwargs: Any) -> Dict[str, Any]:
@@ -161,6 +186,51 @@ class BaseClient(ABC):
             logger.error(f"Chat interaction failed: {str(e)}")
             raise
 
+    def _make_structured_api_call(self, *args: Any, **kwargs: Any) -> List[Any]:
+        """
+        Make an API call that parses every returned choice into a schema.
+
+        Clients that support structured output should override this method and set
+        `supports_structured_output` to True.
+
+        Args:
+            *args: Variable length argument list.
+            **kwargs: Arbitrary keyword arguments, including the `response_format` schema.
+
+        Returns:
+            List[Any]: One parsed object per returned choice.
+
+        Raises:
+            NotImplementedError: If the client does not support structured output.
+        """
+        raise NotImplementedError("Subclasses must implement _make_structured_api_call method")
+
+    def chat_structured(self, *args: Any, **kwargs: Any) -> List[Any]:
+        """
+        Initiate a chat interaction whose replies are parsed into a schema.
+
+        Like `chat`, the API call is wrapped with retry logic.
+
+        Args:
+            *args: Variable length argument list.
+            **kwargs: Arbitrary keyword arguments, including the `response_format` schema.
+
+        Returns:
+            List[Any]: One parsed object per returned choice.
+
+        Raises:
+            NotImplementedError: If the client does not support structured output.
+            Exception: If the API call fails after all retry attempts.
+        """
+        # Checked up front so an unsupported client fails fast instead of going through the retries.
+        if not self.supports_structured_output:
+            raise NotImplementedError(f"{type(self).__name__} does not support structured output")
+        try:
+            return self._retry_with_tenacity(self._make_structured_api_call, *args, **kwargs)
+        except Exception as e:
+            logger.error(f"Structured chat interaction failed: {str(e)}")
+            raise
+
 
 class OpenAIClient(BaseClient):
     """
@@ -174,6 +244,8 @@ class OpenAIClient(BaseClient):
         tokenizer (Encoding): The tokenizer for encoding/decoding messages.
     """
 
+    supports_structured_output: bool = True
+
     def __init__(self, api_key: str, max_input_len: int = MAX_INPUT_LEN, max_output_len: int = MAX_OUTPUT_LEN):
         """
         Initialize the OpenAIClient.
@@ -214,6 +286,20 @@ class OpenAIClient(BaseClient):
         """
         return self.tokenizer.decode(tokens)
 
+    def _record_completion_usage(self, completion: Any) -> None:
+        """
+        Record the token usage reported on an OpenAI completion.
+
+        Args:
+            completion (Any): The completion returned by the OpenAI client.
+        """
+        usage = completion.usage
+        if usage is None:
+            return
+        details = usage.prompt_tokens_details
+        cached_tokens = (details.cached_tokens or 0) if details is not None else 0
+        self._record_usage(usage.prompt_tokens, cached_tokens, usage.completion_tokens)
+
     def _make_api_call(self, *args: Any, **kwargs: Any) -> Dict[str, Any]:
         """
         Make an API call to OpenAI's chat completions endpoint.
@@ -235,11 +321,86 @@ class OpenAIClient(BaseClient):
                 timeout=API_TIMEOUT, 
                 max_tokens=self.max_output_len
             )
+            self._record_completion_usage(completion)
             return completion.choices[0].message.content
         except Exception as e:
             logger.error(f"OpenAI API call failed: {str(e)}")
             raise
 
+    def _make_structured_api_call(self, *args: Any, response_format: Any, **kwargs: Any) -> List[Any]:
+        """
+        Make an API call to OpenAI's chat completions endpoint with a JSON schema response format.
+
+        Pass `n` to request several independent choices in a single call. Each choice is
+        validated on its own, so one truncated or malformed choice doesn't discard the others.
+
+        Args:
+            *args: Variable length argument list.
+            response_format (Type[BaseModel]): The pydantic model every choice is parsed into.
+            **kwargs: Arbitrary keyword arguments.
+
+        Returns:
+            List[Any]: The parsed choices; refusals and choices that fail validation are dropped.
+
+        Raises:
+            Exception: If the API call fails.
+        """
+        from pydantic import ValidationError
+
+        try:
+            completion = self.client.chat.completions.create(
+                *args,
+                **kwargs,
+                response_format={
+                    "type": "json_schema",
+                    "json_schema": {
+                        "name": response_format.__name__,
+                        "schema": _strict_json_schema(response_format.model_json_schema()),
+                        "strict": True
+                    }
+                },
+                timeout=API_TIMEOUT,
+                max_tokens=self.max_output_len
+            )
+            self._record_completion_usage(completion)
+        except Exception as e:
+            logger.error(f"OpenAI structured API call failed: {str(e)}")
+            raise
+
+        parsed = []
+        for choice in completion.choices:
+            if not choice.message.content:
+                logger.warning(f"Dropping choice {choice.index}: no content (finish_reason={choice.finish_reason})")
+                continue
+            try:
+                parsed.append(response_format.model_validate_json(choice.message.content))
+            except ValidationError as e:
+                logger.warning(f"Dropping choice {choice.index} (finish_reason={choice.finish_reason}): {str(e)}")
+        return parsed
+
+
+def _strict_json_schema(schema: Any) -> Any:
+    """
+    Make a pydantic JSON schema acceptable to OpenAI's strict structured output mode.
+
+    Strict mode requires every object to forbid additional properties.
+
+    Args:
+        schema (Any): The schema, or a node of it.
+
+    Returns:
+        Any: The same schema, updated in place.
+    """
+    if isinstance(schema, dict):
+        if schema.get('type') == 'object':
+            schema.setdefault('additionalProperties', False)
+        for value in schema.values():
+            _strict_json_schema(value)
+    elif isinstance(schema, list):
+        for value in schema:
+            _strict_json_schema(value)
+    return schema
+
 def create_client(client_type: str, api_key: str, api_base: str = "", model_name: str = "", 
                   max_input_len: int = MAX_INPUT_LEN, max_output_len: int = MAX_OUTPUT_LEN) -> Union[OpenAIClient]:
     """
@@ -0,0 +1,439 @@
+"""
+This module verifies structured fix candidates by building them.
+
+Each candidate FixResponse is applied to its own scratch copy of the project and the
+project's build step (e.g. `mvn compile`) is run against it. Builds run concurrently and
+the first candidate whose build passes is returned, replacing manual /retry round trips.
+
+Scratch copies are independent of the project: they are cloned with reflinks
+(`cp --reflink=auto` on Linux, clonefile on APFS) where the filesystem supports it, so
+unchanged data is shared copy-on-write, and fall back to a plain copy everywhere else.
+Writes made by patches or by the build only ever touch the scratch copy.
+
+Classes:
+    VerificationResult: Outcome of building a single candidate.
+    BuildGroup: Tracks concurrent build processes so the losers can be killed.
+
+Functions:
+    apply_patch_to_lines: Apply a Patch to a file's lines.
+    project_relative_path: Resolve a file path from an error log against the project.
+    create_scratch_copy: Create an independent scratch copy of a project.
+    verify_candidate: Apply one candidate to a scratch copy and build it.
+    find_first_passing_fix: Build all candidates concurrently and return the first that passes.
+    format_fix_markdown: Render a FixResponse as markdown.
+"""
+
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+import signal
+import tempfile
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Optional
+from pydantic import BaseModel
+from agent.stack_overflow_checker import FixResponse, Patch
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+# Load configuration from environment variables
+VERIFY_BUILD_COMMAND = os.getenv('VERIFY_BUILD_COMMAND', 'mvn -q compile')
+VERIFY_TIMEOUT = int(os.getenv('VERIFY_TIMEOUT', 300))
+VERIFY_MAX_WORKERS = int(os.getenv('VERIFY_MAX_WORKERS', 4))
+
+# Build outputs and VCS metadata at the project root are not needed to build a candidate.
+# Only the root is filtered: source packages may be named e.g. com/acme/build/.
+SCRATCH_IGNORE = ('target', 'build', '.git', '.gradle')
+
+
+class VerificationResult(BaseModel):
+    candidate_index: int
+    fix: FixResponse
+    passed: bool
+    output: str
+
+
+def apply_patch_to_lines(lines: List[str], patch: Patch) -> List[str]:
+    """
+    Apply a Patch to a file's lines.
+
+    All line numbers in the patch refer to the original (1-based) lines, so the edits
+    are independent of each other and of the order they are listed in.
+
+    Args:
+        lines (List[str]): The original lines, with line endings.
+        patch (Patch): The patch to apply.
+
+    Returns:
+        List[str]: The patched lines.
+
+    Raises:
+        ValueError: If the patch references a line outside the file.
+    """
+    line_count = len(lines)
+    deletions = set(patch.deletions)
+    modifications = {m.line_number: m.modified_line for m in patch.modifications}
+    insertions = {}
+    for insertion in patch.insertions:
+        insertions.setdefault(insertion.line_number, []).extend(insertion.new_lines)
+
+    for line_number in deletions | set(modifications):
+        if not 1 <= line_number <= line_count:
+            raise ValueError(f"Line {line_number} is out of range for {patch.file_path}")
+    for line_number in insertions:
+        if not 0 <= line_number <= line_count:
+            raise ValueError(f"Insertion point {line_number} is out of range for {patch.file_path}")
+
+    def as_lines(new_lines):
+        return [line if line.endswith('\n') else line + '\n' for line in new_lines]
+
+    patched = as_lines(insertions.get(0, []))
+    for line_number, line in enumerate(lines, start=1):
+        if line_number in modifications and line_number not in deletions:
+            patched.extend(as_lines([modifications[line_number]]))
+        elif line_number not in deletions:
+            patched.append(line if line.endswith('\n') else line + '\n')
+        patched.extend(as_lines(insertions.get(line_number, [])))
+    return patched
+
+
+def _clone_command() -> Optional[List[str]]:
+    if sys.platform == 'darwin':
+        # -c clones with clonefile(2) on APFS
+        return ['cp', '-R', '-c']
+    if sys.platform.startswith('linux'):
+        # Reflinks on btrfs/XFS/..., a regular copy on other filesystems
+        return ['cp', '-R', '--reflink=auto']
+    return None
+
+
+def _remove_path(path: str) -> None:
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path, ignore_errors=True)
+    elif os.path.lexists(path):
+        os.unlink(path)
+
+
+def _clone_entry(src: str, dst: str) -> None:
+    command = _clone_command()
+    if command:
+        completed = subprocess.run(command + [src, dst], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        if completed.returncode == 0:
+            return
+        _remove_path(dst)
+    if os.path.isdir(src) and not os.path.islink(src):
+        shutil.copytree(src, dst, symlinks=True)
+    else:
+        shutil.copy2(src, dst, follow_symlinks=False)
+
+
+def create_scratch_copy(project_dir: str) -> str:
+    """
+    Create an independent scratch copy of a project.
+
+    Files are cloned copy-on-write where the filesystem supports it and copied otherwise;
+    the scratch copy never shares writable data with the project.
+
+    Args:
+        project_dir (str): The project to copy.
+
+    Returns:
+        str: The path of the scratch project directory.
+
+    Raises:
+        OSError: If the copy fails; the partial scratch copy is removed.
+    """
+    scratch_root = tempfile.mkdtemp(prefix='termbuddy-')
+    try:
+        scratch_dir = os.path.join(scratch_root, os.path.basename(os.path.normpath(project_dir)))
+        os.mkdir(scratch_dir)
+        for name in os.listdir(project_dir):
+            if name in SCRATCH_IGNORE:
+                continue
+            _clone_entry(os.path.join(project_dir, name), os.path.join(scratch_dir, name))
+    except BaseException:
+        shutil.rmtree(scratch_root, ignore_errors=True)
+        raise
+    return scratch_dir
+
+
+def project_relative_path(project_dir: str, file_path: str) -> str:
+    """
+    Resolve a file path from an error log against the project directory.
+
+    Relative paths are taken relative to the project, never to the server's working
+    directory, so the file shown to the model is the file that gets patched.
+
+    Args:
+        project_dir (str): The project directory.
+        file_path (str): An absolute path, or a path relative to the project.
+
+    Returns:
+        str: The path relative to the project directory.
+
+    Raises:
+        ValueError: If the path is outside the project.
+    """
+    if not os.path.isabs(file_path):
+        file_path = os.path.join(project_dir, file_path)
+    relative_path = os.path.relpath(os.path.realpath(file_path), os.path.realpath(project_dir))
+    if relative_path == os.pardir or relative_path.startswith(os.pardir + os.sep):
+        raise ValueError(f"{file_path} is outside of {project_dir}")
+    return relative_path
+
+
+def _merge_patches(patches: List[Patch]) -> Patch:
+    # All patches for one file refer to the same original lines, so they are combined
+    # into one patch and applied in a single pass.
+    modifications = {}
+    for patch in patches:
+        for modification in patch.modifications:
+            existing = modifications.get(modification.line_number)
+            if existing is not None and existing.modified_line != modification.modified_line:
+                raise ValueError(f"Conflicting modifications of line {modification.line_number} in {patch.file_path}")
+            modifications[modification.line_number] = modification
+    return Patch(
+        file_path=patches[0].file_path,
+        insertions=[insertion for patch in patches for insertion in patch.insertions],
+        deletions=sorted({line_number for patch in patches for line_number in patch.deletions}),
+        modifications=list(modifications.values())
+    )
+
+
+def apply_fix_response(fix: FixResponse, project_dir: str, scratch_dir: str) -> None:
+    """
+    Apply every patch of a FixResponse to a scratch copy of the project.
+
+    Patches that target the same file are merged and applied to the original lines
+    in one pass, since all of their line numbers refer to the original file.
+
+    Args:
+        fix (FixResponse): The candidate fix.
+        project_dir (str): The original project directory the patch paths refer to.
+        scratch_dir (str): The scratch copy to patch.
+
+    Raises:
+        ValueError: If a patch targets a file outside the project, an invalid line,
+            or modifies a line differently from another patch for the same file.
+        FileNotFoundError: If a patch targets a file that does not exist.
+    """
+    patches_by_file = {}
+    for patch in fix.fixes:
+        relative_path = project_relative_path(project_dir, patch.file_path)
+        patches_by_file.setdefault(relative_path, []).append(patch)
+
+    for relative_path, patches in patches_by_file.items():
+        target = os.path.join(scratch_dir, relative_path)
+        with open(target, 'r', encoding='utf-8') as target_file:
+            lines = target_file.readlines()
+        patched = apply_patch_to_lines(lines, _merge_patches(patches))
+        with open(target, 'w', encoding='utf-8') as target_file:
+            target_file.writelines(patched)
+
+
+def _stop_process(process: subprocess.Popen) -> None:
+    # Builds run in their own session, so signal the whole group: mvn forks a JVM.
+    if process.poll() is not None:
+        return
+    try:
+        if os.name == 'posix':
+            os.killpg(process.pid, signal.SIGTERM)
+        else:
+            process.terminate()
+        process.wait(timeout=5)
+    except subprocess.TimeoutExpired:
+        if os.name == 'posix':
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except ProcessLookupError:
+        pass
+
+
+class BuildGroup:
+    """
+    Tracks the build processes started for one verification run so they can be stopped together.
+
+    Once `stop_all` has been called, no new build is started.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._processes: List[subprocess.Popen] = []
+        self._stopped = False
+
+    def start(self, args: List[str], cwd: str) -> Optional[subprocess.Popen]:
+        """
+        Start a build process, unless the group has already been stopped.
+
+        Args:
+            args (List[str]): The command line.
+            cwd (str): The directory to build in.
+
+        Returns:
+            Optional[subprocess.Popen]: The started process, or None if the group was stopped.
+
+        Raises:
+            OSError: If the process cannot be started.
+        """
+        with self._lock:
+            if self._stopped:
+                return None
+            process = subprocess.Popen(
+                args,
+                cwd=cwd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                start_new_session=True
+            )
+            self._processes.append(process)
+            return process
+
+    def stop_all(self) -> None:
+        """
+        Stop every running build and prevent new ones from starting.
+        """
+        with self._lock:
+            self._stopped = True
+            processes = list(self._processes)
+        for process in processes:
+            _stop_process(process)
+
+
+def run_build(scratch_dir: str, build_command: str = VERIFY_BUILD_COMMAND, timeout: int = VERIFY_TIMEOUT,
+              builds: Optional[BuildGroup] = None) -> tuple:
+    """
+    Run the build command inside a scratch directory.
+
+    Args:
+        scratch_dir (str): The directory to build in.
+        build_command (str, optional): The shell-style build command.
+        timeout (int, optional): Seconds before the build is killed and counted as failed.
+        builds (BuildGroup, optional): The group to register the build with so it can be stopped early.
+
+    Returns:
+        tuple: (passed, output) where output is the combined stdout and stderr.
+    """
+    builds = builds or BuildGroup()
+    try:
+        process = builds.start(shlex.split(build_command), scratch_dir)
+    except OSError as e:
+        return False, f"Build could not be started: {str(e)}"
+    if process is None:
+        return False, "Build cancelled"
+
+    try:
+        output, _ = process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        _stop_process(process)
+        process.communicate()
+        return False, f"Build timed out after {timeout} seconds"
+    return process.returncode == 0, output
+
+
+def verify_candidate(index: int, fix: FixResponse, project_dir: str,
+                     build_command: str = VERIFY_BUILD_COMMAND, timeout: int = VERIFY_TIMEOUT,
+                     builds: Optional[BuildGroup] = None) -> VerificationResult:
+    """
+    Apply one candidate to a fresh scratch copy and build it.
+
+    Args:
+        index (int): The candidate's position in the candidate list.
+        fix (FixResponse): The candidate fix.
+        project_dir (str): The project to copy and build.
+        build_command (str, optional): The shell-style build command.
+        timeout (int, optional): Seconds before the build is killed.
+        builds (BuildGroup, optional): The group to register the build with so it can be stopped early.
+
+    Returns:
+        VerificationResult: The build outcome; the scratch copy is removed afterwards.
+    """
+    try:
+        # shutil.Error (e.g. an unreadable file or socket) is an OSError too
+        scratch_dir = create_scratch_copy(project_dir)
+    except OSError as e:
+        return VerificationResult(candidate_index=index, fix=fix, passed=False,
+                                  output=f"Scratch copy could not be created: {str(e)}")
+    try:
+        try:
+            apply_fix_response(fix, project_dir, scratch_dir)
+        except (OSError, ValueError) as e:
+            return VerificationResult(candidate_index=index, fix=fix, passed=False,
+                                      output=f"Patch could not be applied: {str(e)}")
+        passed, output = run_build(scratch_dir, build_command, timeout, builds)
+        return VerificationResult(candidate_index=index, fix=fix, passed=passed, output=output)
+    finally:
+        shutil.rmtree(os.path.dirname(scratch_dir), ignore_errors=True)
+
+
+def find_first_passing_fix(candidates: List[FixResponse], project_dir: str,
+                           build_command: str = VERIFY_BUILD_COMMAND, timeout: int = VERIFY_TIMEOUT,
+                           max_workers: int = VERIFY_MAX_WORKERS) -> Optional[VerificationResult]:
+    """
+    Build all candidates concurrently and return the first one that passes.
+
+    Every build already runs in its own child process, so a thread pool is enough to
+    run them in parallel without forking the (large) server process. As soon as one
+    candidate passes, or if this function raises, the remaining builds are killed.
+
+    Args:
+        candidates (List[FixResponse]): The candidate fixes.
+        project_dir (str): The project to copy and build.
+        build_command (str, optional): The shell-style build command.
+        timeout (int, optional): Seconds before each build is killed.
+        max_workers (int, optional): Maximum number of concurrent builds.
+
+    Returns:
+        Optional[VerificationResult]: The first passing candidate, or None if none pass.
+    """
+    if not candidates:
+        return None
+
+    builds = BuildGroup()
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(candidates)))
+    try:
+        futures = [
+            executor.submit(verify_candidate, index, fix, project_dir, build_command, timeout, builds)
+            for index, fix in enumerate(candidates)
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            logger.info(f"Candidate {result.candidate_index} {'passed' if result.passed else 'failed'}")
+            if result.passed:
+                return result
+        return None
+    finally:
+        # Kill the losing builds; their workers then return promptly and remove their scratch copies.
+        builds.stop_all()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def format_fix_markdown(fix: FixResponse) -> str:
+    """
+    Render a FixResponse as markdown.
+
+    Args:
+        fix (FixResponse): The fix to render.
+
+    Returns:
+        str: The markdown description of every patch.
+    """
+    sections = []
+    for patch in fix.fixes:
+        edits = []
+        for modification in sorted(patch.modifications, key=lambda m: m.line_number):
+            edits.append(f"- **Line {modification.line_number}**: change to `{modification.modified_line.strip()}`")
+        for line_number in sorted(patch.deletions):
+            edits.append(f"- **Line {line_number}**: delete")
+        for insertion in sorted(patch.insertions, key=lambda i: i.line_number):
+            new_lines = "\n".join(insertion.new_lines)
+            edits.append(f"- **After line {insertion.line_number}**: insert\n\n```\n{new_lines}\n```")
+        sections.append(f"### `{patch.file_path}`\n\n" + "\n".join(edits))
+    return "## Verified fix (build passed)\n\n" + "\n\n".join(sections)
@@ -0,0 +1,126 @@
+"""
+This module assembles the fix-generation prompts in a deterministic, cache-friendly layout.
+
+Provider-side prompt caching only hits when a request starts with a byte-identical prefix
+of an earlier one. Messages are therefore ordered from the most static content to the most
+dynamic one, and every section is serialized canonically:
+
+    1. system prompt (constant)
+    2. code file snapshots (sorted by path)
+    3. Stack Overflow context
+    4. error message
+    5. previous fixes (append-only, so every /retry extends the previous prefix)
+
+Functions:
+    normalize_text: Canonicalize line endings and trailing whitespace.
+    number_lines: Prefix every line with its line number.
+    serialize_code_files: Render code files in a stable order.
+    build_fix_messages: Build the chat messages for a fix request.
+"""
+
+from typing import Dict, List, Optional, Union
+
+
+FIX_SYSTEM_PROMPT = """You are an expert software developer.
+Task: Given an error message, the files relating to the error(optional), and Stack Overflow suggestions, you need to generate an accurate code fix for the error. Note that there may be multiple errors in the code. Handle them all.
+Find the best possible fixes for the issue, ensuring correctness and clarity. Don't give any irrelevant suggestions. If previous fixes are listed, they did not work; do not repeat these mistakes.
+Give the best solution in a well structured and concise manner. You need only to mention the edits required (with line numbers if code files are provided), not the entire updated code.
+Output format: You need to reply using well formatted Markdown with nice colors."""
+
+STRUCTURED_FIX_SYSTEM_PROMPT = """You are an expert software developer.
+Task: Given an error message, the files relating to the error, and Stack Overflow suggestions, you need to generate an accurate code fix for the error as line-level patches. Note that there may be multiple errors in the code. Handle them all.
+Each candidate must be a complete, self-contained fix. If previous fixes are listed, they did not work; do not repeat these mistakes.
+Every line number refers to the ORIGINAL file as shown (1-based), never to a partially edited file.
+- modifications: replace the line at line_number with modified_line.
+- deletions: remove the lines at these line numbers.
+- insertions: insert new_lines after line_number (use 0 to insert at the top of the file).
+Use the file paths exactly as given. Only patch files that were provided."""
+
+
+def normalize_text(text: str) -> str:
+    """
+    Canonicalize line endings and strip trailing whitespace.
+
+    Leading lines are kept so line numbers still match the original text.
+
+    Args:
+        text (str): The text to normalize.
+
+    Returns:
+        str: The text with '\\n' line endings and no trailing whitespace.
+    """
+    return text.replace('\r\n', '\n').replace('\r', '\n').rstrip()
+
+
+def number_lines(content: str) -> str:
+    """
+    Prefix every line with its 1-based line number.
+
+    Args:
+        content (str): The file content.
+
+    Returns:
+        str: The numbered content.
+    """
+    # Only line endings are normalized so the numbers match the file on disk.
+    lines = content.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    if lines and lines[-1] == '':
+        lines.pop()
+    return "\n".join(f"{i}: {line.rstrip()}" for i, line in enumerate(lines, start=1))
+
+
+def serialize_code_files(code_files: Dict[str, str], numbered: bool = False) -> str:
+    """
+    Render code files in a stable order.
+
+    Args:
+        code_files (Dict[str, str]): File contents keyed by path.
+        numbered (bool, optional): Prefix every line with its line number.
+
+    Returns:
+        str: One fenced block per file, sorted by path.
+    """
+    blocks = []
+    for path in sorted(code_files):
+        content = number_lines(code_files[path]) if numbered else normalize_text(code_files[path])
+        blocks.append(f"### File: {path}\n```\n{content}\n```")
+    return "\n\n".join(blocks)
+
+
+def build_fix_messages(system_prompt: str, error_message: str, so_context: str,
+                       code_files: Optional[Dict[str, str]] = None,
+                       previous_fixes: Optional[Union[str, List[str]]] = None,
+                       numbered: bool = False) -> List[Dict[str, str]]:
+    """
+    Build the chat messages for a fix request, ordered from static to dynamic content.
+
+    Args:
+        system_prompt (str): The constant system prompt.
+        error_message (str): The error log.
+        so_context (str): The Stack Overflow context.
+        code_files (Dict[str, str], optional): File contents keyed by path.
+        previous_fixes (Union[str, List[str]], optional): Earlier fixes that did not work, oldest first.
+        numbered (bool, optional): Prefix code lines with their line numbers.
+
+    Returns:
+        List[Dict[str, str]]: The system and user messages.
+    """
+    sections = []
+    if code_files:
+        sections.append("## Error files\n\n" + serialize_code_files(code_files, numbered=numbered))
+    sections.append("## Stack Overflow solution suggestions\n\n" + normalize_text(so_context or ""))
+    sections.append("## Error message\n\n```\n" + normalize_text(error_message) + "\n```")
+
+    if previous_fixes:
+        if isinstance(previous_fixes, str):
+            previous_fixes = [previous_fixes]
+        attempts = [
+            f"### Attempt {i}\n\n{normalize_text(fix)}"
+            for i, fix in enumerate(previous_fixes, start=1)
+        ]
+        sections.append("## Previous fixes that did not work\n\n" + "\n\n".join(attempts))
+
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": "\n\n".join(sections) + "\n"}
+    ]
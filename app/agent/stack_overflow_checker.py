@@ -5,6 +5,7 @@ from sentence_transformers import SentenceTransformer
 from bs4 import BeautifulSoup
 from openai import OpenAI
 from pydantic import BaseModel
+from agent.prompt_templates import build_fix_messages, FIX_SYSTEM_PROMPT, STRUCTURED_FIX_SYSTEM_PROMPT
 
 class Insertion(BaseModel):
     line_number: int
@@ -98,39 +99,38 @@ def fetch_context_for_query(query):
 
     return "\n\n".join(context[:5])
 
+def count_message_tokens(client, messages):
+    return sum(len(client.encode(message["content"])) for message in messages)
+
+def build_messages_within_budget(client, system_prompt, error_message, so_context, error_files,
+                                 previous_fixes = None, numbered = False):
+    if isinstance(previous_fixes, str):
+        previous_fixes = [previous_fixes]
+    previous_fixes = list(previous_fixes or [])
+    messages = build_fix_messages(system_prompt, error_message, so_context, error_files,
+                                  previous_fixes=previous_fixes, numbered=numbered)
+    # Drop the oldest attempts first until the prompt fits; the rest of the prompt is required.
+    while previous_fixes and count_message_tokens(client, messages) > client.max_input_len:
+        previous_fixes = previous_fixes[1:]
+        messages = build_fix_messages(system_prompt, error_message, so_context, error_files,
+                                      previous_fixes=previous_fixes, numbered=numbered)
+    return messages
+
+def generate_structured_fixes(client, error_message, so_context, error_files, n_candidates=3, previous_fixes = None):
+    messages = build_messages_within_budget(client, STRUCTURED_FIX_SYSTEM_PROMPT, error_message, so_context,
+                                            error_files, previous_fixes=previous_fixes, numbered=True)
+    # A higher temperature than the markdown path keeps the n candidates from collapsing into one.
+    return client.chat_structured(
+        model="gpt-4o-mini",
+        messages=messages,
+        response_format=FixResponse,
+        n=n_candidates,
+        temperature=0.7
+    )
+
 def generate_fix_with_llm(client, error_message, so_context, error_files, previous_fixes = None):
-    prompt = f"""
-Error message:
-"{error_message}"
-"""
-
-    if error_files:
-        prompt += f"""
-Error files:
-"{error_files}"
-"""
-
-    prompt += f"""
-Stack Overflow solution suggestions:
-{so_context}
-
-Find the best possible fixes for the issue, ensuring correctness and clarity. Don't give any irrelevant suggestions.
-
-"""
-    if previous_fixes:
-        prompt += f"""
-Here are the previous fixes attempted that did not work, do not repeat these mistakes:
-
-"{previous_fixes}"
-"""
-
-    messages = [
-        {"role": "system", "content": """You are an expert software developer. 
-Task: Given an error message, the files relating to the error(optional), and Stack Overflow suggestions, you need to generate an accurate code fix for the error. Note that there may be multiple errors in the code. Handle them all.
-Give the best solution in a well structured and concise manner. You need only to mention the edits required (with line numbers if code files are provided), not the entire updated code.
-Output format: You need to reply using well formatted Markdown with nice colors."""},
-        {"role": "user", "content": prompt}
-    ]
+    messages = build_messages_within_budget(client, FIX_SYSTEM_PROMPT, error_message, so_context,
+                                            error_files, previous_fixes=previous_fixes)
     completion = client.chat(
         model="gpt-4o-mini",
         messages=messages,
@@ -1,5 +1,41 @@
 import re
+import os
+import gzip
+import zstandard
+
+# Upper bound on a decompressed upload, so a small compressed body can't expand without limit.
+MAX_UPLOAD_BYTES = int(os.getenv('MAX_UPLOAD_BYTES', 8 * 1024 * 1024))
+UPLOAD_CHUNK_SIZE = 64 * 1024
 
 def extract_java_files(stack_trace):
     java_files = re.findall(r'(?:/[\w/\\.-]+|[\w/\\.-]+)\.java', stack_trace)
-    return java_files
\ No newline at end of file
+    return java_files
+
+def read_compressed_stream(stream, content_encoding, max_bytes=MAX_UPLOAD_BYTES):
+    """
+    Decompress a request body as a stream and return it as text.
+
+    Supports gzip, zstd and uncompressed (identity) bodies. The body is decompressed
+    chunk by chunk and never written to disk.
+    """
+    encoding = (content_encoding or 'identity').strip().lower()
+    if encoding == 'gzip':
+        reader = gzip.GzipFile(fileobj=stream, mode='rb')
+    elif encoding == 'zstd':
+        reader = zstandard.ZstdDecompressor().stream_reader(stream)
+    elif encoding == 'identity':
+        reader = stream
+    else:
+        raise ValueError(f"Unsupported Content-Encoding: {content_encoding}")
+
+    chunks = []
+    total = 0
+    while True:
+        chunk = reader.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > max_bytes:
+            raise ValueError(f"Decompressed upload exceeds {max_bytes} bytes")
+        chunks.append(chunk)
+    return b''.join(chunks).decode('utf-8', errors='replace')
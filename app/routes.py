@@ -1,11 +1,14 @@
 from flask import Flask, request, jsonify, abort
 import os
+from collections import OrderedDict
+import zstandard
 from openai import OpenAI
 from agent.basic_llm import get_answer
 from agent.clients import create_client
 import helper
 from agent.query_generator import get_query_list
-from agent.stack_overflow_checker import fetch_context_for_query, generate_fix_with_llm
+from agent.stack_overflow_checker import fetch_context_for_query, generate_fix_with_llm, generate_structured_fixes
+from agent.patch_verifier import find_first_passing_fix, format_fix_markdown, project_relative_path
 from dotenv import load_dotenv
 
 load_dotenv('../env')
@@ -15,6 +18,19 @@ app = Flask(__name__)
 llm_client = create_client('openai', os.getenv('OPENAI_API_KEY'))
 
 generated_fixes_store = []
+# Logs received through /generate_upload and their fixes, keyed by the client's X-Termbuddy-Session
+# header, so /retry works without a file on this host and clients sharing a server stay separate.
+upload_sessions = OrderedDict()
+# (error_log, context) that generated_fixes_store was built on. Kept with the fixes, like the
+# 'context' of each upload session, so /retry re-sends the exact same context: this skips the
+# query/search round trips and keeps the prompt prefix byte-identical for the provider's cache.
+generated_fixes_context = None
+
+FIX_CANDIDATES = int(os.getenv('FIX_CANDIDATES', 3))
+MAX_FIX_CANDIDATES = int(os.getenv('MAX_FIX_CANDIDATES', 5))
+MAX_PREVIOUS_FIXES = int(os.getenv('MAX_PREVIOUS_FIXES', 3))
+MAX_UPLOAD_SESSIONS = int(os.getenv('MAX_UPLOAD_SESSIONS', 64))
+SESSION_HEADER = 'X-Termbuddy-Session'
 
 def generate_llm_response(query):
     formatted_query = f"""
@@ -29,6 +45,64 @@ def generate_llm_response(query):
     return generated_text
 
 
+def get_so_context(error_log):
+    queries = get_query_list(error_log)
+    print(queries)
+    # test_query = queries[0]
+
+    context = None
+
+    while not context:
+        for query in queries:
+            context = fetch_context_for_query(query)
+            if context:
+                break
+
+    return context
+
+
+def read_code_files(error_log):
+    error_files = helper.extract_java_files(error_log)
+    code_files = {}
+
+    for error_file in error_files:
+        if os.path.exists(error_file):
+            with open(error_file, 'r', encoding='utf-8') as code_file:
+                code_files[error_file] = code_file.read()
+        else:
+            print(f"File {error_file} does not exist.")
+
+    return code_files
+
+
+def generate_fix_for_log(error_log, code_files):
+    context = get_so_context(error_log)
+
+    print("CONTEXT", context)
+
+    generated_fix = None
+
+    if context:
+        generated_fix = generate_fix_with_llm(llm_client, error_log, context, code_files)
+        print("Generated Fix:\n", generated_fix)
+
+    return generated_fix, context
+
+
+def get_session_id():
+    session_id = request.headers.get(SESSION_HEADER, '').strip()
+    if not session_id or len(session_id) > 128:
+        return None
+    return session_id
+
+
+def store_upload_session(session_id, error_log, context, generated_fix):
+    upload_sessions[session_id] = {'error_log': error_log, 'context': context, 'fixes': [generated_fix]}
+    upload_sessions.move_to_end(session_id)
+    while len(upload_sessions) > MAX_UPLOAD_SESSIONS:
+        upload_sessions.popitem(last=False)
+
+
 @app.route('/generate', methods=['GET'])
 def generate():
     try:
@@ -43,61 +117,72 @@ def generate():
         with open(error_file_path, 'r', encoding='utf-8') as error_file:
             error_log = error_file.read()
 
-        error_files = helper.extract_java_files(error_log)
-        code_files = {}
+        global generated_fixes_store, generated_fixes_context
+        generated_fixes_store = []
 
-        for error_file in error_files:
-            if os.path.exists(error_file):
-                with open(error_file, 'r', encoding='utf-8') as code_file:
-                    code_files[error_file] = code_file.read()
-            else:
-                print(f"File {error_file} does not exist.")
+        generated_fix, context = generate_fix_for_log(error_log, read_code_files(error_log))
 
-        queries = get_query_list(error_log)
-        print(queries)
-        # test_query = queries[0]
+        if not generated_fix:
+            return jsonify({'error': 'No fix generated'}), 400
 
-        context = None
+        generated_fixes_store.append(generated_fix)
+        generated_fixes_context = (error_log, context)
+        return generated_fix
 
-        while not context:
-            for query in queries:
-                context = fetch_context_for_query(query)
-                if context:
-                    break
+    except Exception as e:
+        return jsonify({'error': 'An unexpected error occurred', 'details': str(e)}), 500
 
-        print("CONTEXT", context)
 
-        global generated_fixes_store
-        generated_fixes_store = []
+@app.route('/generate_upload', methods=['POST'])
+def generate_upload():
+    try:
+        session_id = get_session_id()
+        if not session_id:
+            return jsonify({'error': f'{SESSION_HEADER} header is required'}), 400
+
+        try:
+            error_log = helper.read_compressed_stream(request.stream, request.headers.get('Content-Encoding'))
+        except (OSError, EOFError, ValueError, zstandard.ZstdError) as e:
+            return jsonify({'error': 'Could not read uploaded log', 'details': str(e)}), 400
+
+        if not error_log.strip():
+            return jsonify({'error': 'Uploaded log is empty'}), 400
+
+        # The uploading client may be on another host, so the .java paths in its log are not
+        # read from this server's filesystem; the fix is generated from the log alone.
+        generated_fix, context = generate_fix_for_log(error_log, {})
 
-        if context:
-            generated_fix = generate_fix_with_llm(llm_client, error_log, context, code_files)
-            generated_fixes_store.append(generated_fix)
-            print("Generated Fix:\n", generated_fix)
-        
         if not generated_fix:
             return jsonify({'error': 'No fix generated'}), 400
-        
+
+        store_upload_session(session_id, error_log, context, generated_fix)
         return generated_fix
 
     except Exception as e:
         return jsonify({'error': 'An unexpected error occurred', 'details': str(e)}), 500
 
 
-@app.route('/retry', methods=['GET'])
-def retry():
-    global generated_fixes_store
+@app.route('/generate_verified', methods=['GET'])
+def generate_verified():
     try:
-        if not generated_fixes_store:
-            return jsonify({'error': 'No previous generated fix available'}), 400
-
         error_file_path = request.args.get('error_file', '')
+        project_dir = request.args.get('project_dir', '')
+        n_candidates = request.args.get('candidates', FIX_CANDIDATES, type=int)
+
+        if not 1 <= n_candidates <= MAX_FIX_CANDIDATES:
+            return jsonify({'error': f'candidates must be between 1 and {MAX_FIX_CANDIDATES}'}), 400
 
         if not error_file_path:
-            abort(400, 'error_file parameter is required')
+            return jsonify({'error': 'error_file parameter is required'}), 400
 
         if not os.path.exists(error_file_path):
-            abort(400, 'Error file does not exist')
+            return jsonify({'error': 'Error file does not exist'}), 400
+
+        if not project_dir:
+            return jsonify({'error': 'project_dir parameter is required'}), 400
+
+        if not os.path.isdir(project_dir):
+            return jsonify({'error': 'Project directory does not exist'}), 400
 
         with open(error_file_path, 'r', encoding='utf-8') as error_file:
             error_log = error_file.read()
@@ -105,14 +190,89 @@ def retry():
         error_files = helper.extract_java_files(error_log)
         code_files = {}
 
+        # Resolve paths the same way the patches are applied: relative to project_dir,
+        # and only files inside it.
         for error_file in error_files:
-            if os.path.exists(error_file):
-                with open(error_file, 'r', encoding='utf-8') as code_file:
+            try:
+                project_path = os.path.join(project_dir, project_relative_path(project_dir, error_file))
+            except ValueError:
+                print(f"File {error_file} is outside of {project_dir}.")
+                continue
+            if os.path.isfile(project_path):
+                with open(project_path, 'r', encoding='utf-8') as code_file:
                     code_files[error_file] = code_file.read()
             else:
                 print(f"File {error_file} does not exist.")
 
-        previous_solution = generated_fixes_store[-1]
+        if not code_files:
+            return jsonify({'error': 'No source files found in the error log to patch'}), 400
+
+        context = get_so_context(error_log)
+
+        global generated_fixes_store, generated_fixes_context
+        generated_fixes_store = []
+
+        candidates = generate_structured_fixes(llm_client, error_log, context, code_files, n_candidates=n_candidates)
+        result = find_first_passing_fix(candidates, project_dir)
+
+        if not result:
+            return jsonify({'error': 'No candidate fix passed the build', 'candidates': len(candidates)}), 422
+
+        generated_fix = format_fix_markdown(result.fix)
+        generated_fixes_store.append(generated_fix)
+        generated_fixes_context = (error_log, context)
+        print("Verified Fix:\n", generated_fix)
+
+        return generated_fix
+
+    except Exception as e:
+        return jsonify({'error': 'An unexpected error occurred', 'details': str(e)}), 500
+
+
+@app.route('/retry', methods=['GET'])
+def retry():
+    global generated_fixes_context
+    try:
+        session_id = get_session_id()
+
+        if session_id:
+            session = upload_sessions.get(session_id)
+            if not session:
+                return jsonify({'error': 'No previous generated fix available'}), 400
+
+            upload_sessions.move_to_end(session_id)
+            error_log = session['error_log']
+            context = session['context']
+            fixes_store = session['fixes']
+            # Uploaded logs come from another host; see generate_upload
+            code_files = {}
+        else:
+            if not generated_fixes_store:
+                return jsonify({'error': 'No previous generated fix available'}), 400
+
+            error_file_path = request.args.get('error_file', '')
+
+            if not error_file_path:
+                abort(400, 'error_file parameter is required')
+
+            if not os.path.exists(error_file_path):
+                abort(400, 'Error file does not exist')
+
+            with open(error_file_path, 'r', encoding='utf-8') as error_file:
+                error_log = error_file.read()
+
+            fixes_store = generated_fixes_store
+            code_files = read_code_files(error_log)
+
+            if generated_fixes_context and generated_fixes_context[0] == error_log:
+                context = generated_fixes_context[1]
+            else:
+                context = get_so_context(error_log)
+                generated_fixes_context = (error_log, context)
+
+        # The most recent attempts, oldest first. Until the window is full each retry prompt
+        # extends the previous one; the prefix up to the error message is always shared.
+        previous_solutions = fixes_store[-MAX_PREVIOUS_FIXES:]
 
 #         retry_query = f"""
 #         ## Code:
@@ -132,22 +292,11 @@ def retry():
         # # generated_text = "SUCCESS"
         # return jsonify({'response': generated_text})
 
-        queries = get_query_list(error_log)
-        print(queries)
-        # test_query = queries[0]
-
-        context = None
-
-        while not context:
-            for query in queries:
-                context = fetch_context_for_query(query)
-                if context:
-                    break
         print(context)
 
         if context:
-            generated_fix = generate_fix_with_llm(llm_client, error_log, context, code_files, previous_fixes = previous_solution)
-            generated_fixes_store.append(generated_fix)
+            generated_fix = generate_fix_with_llm(llm_client, error_log, context, code_files, previous_fixes = previous_solutions)
+            fixes_store.append(generated_fix)
             print("Generated Fix:\n", generated_fix)
         
         return generated_fix
@@ -16,12 +16,97 @@ end tell
 EOF
 }
 
+# Capture settings for TERMBUDDY_CAPTURE_MODE=ring (default mode "file" tees everything to disk)
+TERMBUDDY_URL="${TERMBUDDY_URL:-http://127.0.0.1:5001}"
+TERMBUDDY_TAIL_LINES="${TERMBUDDY_TAIL_LINES:-200}"
+TERMBUDDY_MAX_ERROR_LINES="${TERMBUDDY_MAX_ERROR_LINES:-100}"
+TERMBUDDY_COMPRESSION="${TERMBUDDY_COMPRESSION:-gzip}"
+# One id per shell, so /retry on a shared server picks up this shell's log and earlier fixes
+TERMBUDDY_SESSION="${TERMBUDDY_SESSION:-$(uuidgen 2>/dev/null || od -An -N16 -tx1 /dev/urandom | tr -d ' \n')}"
+
+# Reads command output on stdin and prints only the error-looking lines that scrolled
+# out of the tail window, followed by the last TERMBUDDY_TAIL_LINES lines.
+# Memory stays bounded no matter how much the command prints.
+_termbuddy_ring_buffer() {
+    awk -v tail_lines="$TERMBUDDY_TAIL_LINES" -v max_errors="$TERMBUDDY_MAX_ERROR_LINES" '
+        { ring[NR % tail_lines] = $0 }
+        n_err < max_errors && tolower($0) ~ /error|exception|fail|fatal|caused by/ {
+            err_nr[++n_err] = NR
+            err[n_err] = $0
+        }
+        END {
+            start = NR - tail_lines + 1
+            if (start < 1) start = 1
+            for (i = 1; i <= n_err; i++) if (err_nr[i] < start) print err[i]
+            if (start > 1) print "... [" start - 1 " earlier lines omitted] ..."
+            for (i = start; i <= NR; i++) print ring[i % tail_lines]
+        }'
+}
+
+_termbuddy_compress() {
+    if [ "$TERMBUDDY_COMPRESSION" = "zstd" ] && command -v zstd &> /dev/null; then
+        zstd -q -c
+    else
+        gzip -c
+    fi
+}
+
+_termbuddy_content_encoding() {
+    if [ "$TERMBUDDY_COMPRESSION" = "zstd" ] && command -v zstd &> /dev/null; then
+        echo "zstd"
+    else
+        echo "gzip"
+    fi
+}
+
+termbuddy_ring_fn() {
+    local captured
+
+    # Pass output through to our stdout (via fd 3) while only the ring buffer is kept in memory
+    set -o pipefail
+    { captured=$("$@" 2>&1 | tee /dev/fd/3 | _termbuddy_ring_buffer); } 3>&1
+    local exit_status=$?
+    set +o pipefail
+
+    if [ $exit_status -ne 0 ]; then
+        echo -e "\033[31m"
+        echo "We noticed that you faced an error! here are some suggestions - " >&2
+        echo -e "\033[0m"
+
+        # POST the compressed capture in the request body; nothing is written to disk
+        response=$(printf '%s\n' "$captured" | _termbuddy_compress | curl -s -w "\n%{http_code}" \
+            -X POST \
+            -H "Content-Type: text/plain" \
+            -H "Content-Encoding: $(_termbuddy_content_encoding)" \
+            -H "X-Termbuddy-Session: $TERMBUDDY_SESSION" \
+            --data-binary @- \
+            "$TERMBUDDY_URL/generate_upload")
+
+        body=$(echo "$response" | sed -e '$d')
+        status_code=$(echo "$response" | tail -n1)
+
+        echo "=============================================================================================================="
+        echo "$body" | glow - -w 100 
+        echo "=============================================================================================================="
+
+        if [ "$status_code" != "200" ]; then
+            echo "Sorry we cannot fetch suggestions $status_code"
+        fi
+    fi
+    return $exit_status
+}
+
 termbuddy_fn()  {
     if [ $# -eq 0 ]; then
         echo "Usage: stream_output <command>" >&2
         return 1
     fi
 
+    if [ "${TERMBUDDY_CAPTURE_MODE:-file}" = "ring" ]; then
+        termbuddy_ring_fn "$@"
+        return $?
+    fi
+
     local combined_file="$HOME/.combined_output.txt"
 
     # Execute the command and capture output
@@ -68,7 +153,12 @@ termbuddy_retry()  {
     ENDPOINT="http://127.0.0.1:5001/retry?code_file=&error_file=$HOME/.combined_output.txt"
 
     # Make the GET request using curl
-    response=$(curl -s -w "\n%{http_code}" $ENDPOINT)
+    if [ "${TERMBUDDY_CAPTURE_MODE:-file}" = "ring" ]; then
+        # The server retries the last log this shell uploaded, so no file path is sent
+        response=$(curl -s -w "\n%{http_code}" -H "X-Termbuddy-Session: $TERMBUDDY_SESSION" "$TERMBUDDY_URL/retry")
+    else
+        response=$(curl -s -w "\n%{http_code}" $ENDPOINT)
+    fi
 
     # Extract the response body and status code
     body=$(echo "$response" | sed -e '$d')